@@ -0,0 +1,82 @@
+"""
+Preflight diagnostics for the Chatterbox integration suite.
+
+Consolidates the CUDA and Perth watermarker checks into one process so the
+heavy torch/perth imports - and the CUDA context - are paid once instead of
+once per standalone check script.
+"""
+
+import statistics
+import time
+
+import numpy as np
+import perth
+import torch
+
+SAMPLE_RATE = 16000
+N_CALLS = 100
+
+
+def _test_audio():
+    # float32 via PCG64: half the memory of the legacy float64 RNG path,
+    # ~3x faster to fill, and deterministic across runs.
+    rng = np.random.default_rng(0)
+    return rng.standard_normal(SAMPLE_RATE, dtype=np.float32)
+
+
+def check_cuda():
+    """Report the torch build and the devices it can see."""
+    print(f"PyTorch version: {torch.__version__}")
+    print(f"CUDA available: {torch.cuda.is_available()}")
+    if torch.cuda.is_available():
+        print(f"CUDA version: {torch.version.cuda}")
+        for i in range(torch.cuda.device_count()):
+            props = torch.cuda.get_device_properties(i)
+            print(f"  Device {i}: {props.name} "
+                  f"({props.total_memory / 1024 / 1024 / 1024:.1f} GB)")
+    elif torch.backends.mps.is_available():
+        print("MPS backend available")
+
+
+def check_perth():
+    """Confirm the Perth watermarker round-trips on synthetic audio."""
+    watermarker = perth.PerthImplicitWatermarker()
+    audio = _test_audio()
+    watermarked = watermarker.apply_watermark(audio, sample_rate=SAMPLE_RATE)
+    watermark = watermarker.get_watermark(watermarked, sample_rate=SAMPLE_RATE)
+    print(f"✓ Watermark applied and extracted (value: {watermark})")
+
+
+def check_perth_detailed():
+    """Characterize the per-call watermarker cost with medians over N calls."""
+    watermarker = perth.PerthImplicitWatermarker()
+    audio = _test_audio()
+
+    apply_times = []
+    get_times = []
+    watermarked = audio
+    for _ in range(N_CALLS):
+        start = time.perf_counter_ns()
+        watermarked = watermarker.apply_watermark(audio, sample_rate=SAMPLE_RATE)
+        apply_times.append(time.perf_counter_ns() - start)
+
+        start = time.perf_counter_ns()
+        _ = watermarker.get_watermark(watermarked, sample_rate=SAMPLE_RATE)
+        get_times.append(time.perf_counter_ns() - start)
+
+    print(f"apply_watermark median: {statistics.median(apply_times) / 1e6:.2f} ms "
+          f"per 1s of {SAMPLE_RATE}Hz audio ({N_CALLS} calls)")
+    print(f"get_watermark median:   {statistics.median(get_times) / 1e6:.2f} ms")
+
+
+def run_all():
+    """Run every diagnostic in one process."""
+    print("Running preflight diagnostics...")
+    check_cuda()
+    check_perth()
+    check_perth_detailed()
+    print("-" * 50)
+
+
+if __name__ == "__main__":
+    run_all()
@@ -0,0 +1,50 @@
+"""
+Runner for the Chatterbox integration test suite.
+
+Verifies the required packages are present before handing over to the suite,
+installing any missing ones in a single pip invocation. All CLI flags are
+passed through to integration_test_suite.py.
+"""
+
+import importlib.metadata
+import subprocess
+import sys
+
+REQUIREMENTS = [
+    "chatterbox-tts",
+    "psutil",
+    "numpy",
+    "torch",
+    "torchaudio",
+]
+
+
+def _is_installed(package):
+    try:
+        importlib.metadata.version(package)
+        return True
+    except importlib.metadata.PackageNotFoundError:
+        return False
+
+
+def install_requirements(requirements=REQUIREMENTS):
+    """Install only the packages that are actually missing, in one pip call."""
+    missing = [p for p in requirements if not _is_installed(p)]
+    if not missing:
+        print("✓ All requirements already satisfied")
+        return
+    print(f"Installing missing packages: {', '.join(missing)}")
+    subprocess.check_call([sys.executable, "-m", "pip", "install", *missing])
+
+
+def main():
+    install_requirements()
+    # Imported late so the torch import happens after the precheck
+    import diagnostics
+    diagnostics.run_all()
+    from integration_test_suite import main as run_suite
+    return run_suite()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,355 @@
+"""
+Quick smoke test for Chatterbox TTS.
+
+Loads the model once, generates a sample utterance, then sweeps the two
+primary controls the API exposes. Runs standalone (python simple_test.py) or
+under pytest, where the model is a session-scoped fixture shared by the
+parametrized sweep cases.
+"""
+
+import contextlib
+import inspect
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import torch
+import torchaudio as ta
+
+try:
+    import soundfile as sf
+except ImportError:
+    sf = None
+
+try:
+    import pytest
+except ImportError:
+    pytest = None
+
+from chatterbox.tts import ChatterboxTTS
+
+TEXT = "Hello! This is a quick test of the Chatterbox text to speech system."
+PARAMS_TO_TEST = [
+    {"exaggeration": 0.5, "cfg_weight": 0.5},
+    {"exaggeration": 0.3, "cfg_weight": 0.3},
+    {"exaggeration": 0.8, "cfg_weight": 0.7},
+]
+
+_model_cache = {}
+_pinned_buffer = None
+_cpu_threads_configured = False
+
+
+def _configure_cpu_threads():
+    """
+    One worker per physical core: hyperthread oversubscription measurably
+    slows the small-batch autoregressive inner loop, and a single interop
+    thread avoids context switching between torch's thread pools. Runs once
+    per process: PyTorch permits exactly one set_num_interop_threads call,
+    so a second model load (e.g. the FP32 reference during an INT8 run)
+    must not retrigger it.
+    """
+    global _cpu_threads_configured
+    if _cpu_threads_configured:
+        return
+    _cpu_threads_configured = True
+    try:
+        import psutil
+        phys = psutil.cpu_count(logical=False) or 1
+    except ImportError:
+        phys = os.cpu_count() or 1
+    os.environ.setdefault("OMP_NUM_THREADS", str(phys))
+    os.environ.setdefault("MKL_NUM_THREADS", str(phys))
+    torch.set_num_threads(phys)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # Already fixed for this process (set elsewhere, or parallel work
+        # has started); keep whatever is in effect.
+        pass
+
+
+def to_host(wav, sr):
+    """
+    Copy a generated waveform to host memory through a persistent pinned
+    buffer. Pinned memory takes the DMA path at full PCIe bandwidth instead
+    of bouncing through a pageable staging allocation. The result is cloned
+    out of the shared buffer so callers (including the background writer)
+    can hold onto it while the buffer is reused.
+    """
+    global _pinned_buffer
+    if wav.device.type != "cuda":
+        return wav
+    flat = wav.reshape(-1)
+    n = flat.numel()
+    if _pinned_buffer is None or _pinned_buffer.numel() < n:
+        # 30s of audio covers every smoke-test utterance
+        _pinned_buffer = torch.empty(max(n, sr * 30), dtype=flat.dtype,
+                                     pin_memory=True)
+    _pinned_buffer[:n].copy_(flat, non_blocking=True)
+    torch.cuda.synchronize()
+    return _pinned_buffer[:n].clone().reshape(wav.shape)
+
+
+def detect_device():
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+def get_model(device=None, compile_model=False, quantize=None):
+    """
+    Load ChatterboxTTS once per process and reuse it, so the several-second
+    from_pretrained cost is amortized over every caller instead of being
+    paid per test case.
+    """
+    device = device or detect_device()
+    key = (device, compile_model, quantize)
+    if key not in _model_cache:
+        if device == "cpu":
+            _configure_cpu_threads()
+        if device == "cuda":
+            # Route FP32 matmuls through TF32 tensor cores on Ampere+; free
+            # speedup for every nn.Linear/Conv in T3 and S3Gen at negligible
+            # quality cost.
+            torch.set_float32_matmul_precision("high")
+            torch.backends.cuda.matmul.allow_tf32 = True
+            torch.backends.cudnn.allow_tf32 = True
+            torch.backends.cudnn.benchmark = True
+
+        model = ChatterboxTTS.from_pretrained(device)
+
+        if device == "cuda" and hasattr(model, "s3gen"):
+            # NHWC layout for the vocoder: only 4D (Conv2d) parameters are
+            # affected, 1D convs pass through untouched. Combined with TF32
+            # or bf16 autocast this hits cuDNN's implicit-GEMM fast path
+            # instead of inserting an NCHW->NHWC reformat on every call.
+            model.s3gen = model.s3gen.to(memory_format=torch.channels_last)
+
+        if quantize == "int8":
+            if device == "cpu":
+                # Dynamic INT8 on the T3 linear layers: weights stored int8,
+                # activations quantized on the fly. A CUDA INT8 path would
+                # need a TensorRT/torch.ao static export upstream.
+                model.t3 = torch.ao.quantization.quantize_dynamic(
+                    model.t3, {torch.nn.Linear}, dtype=torch.qint8)
+            else:
+                print("⚠ INT8 dynamic quantization is CPU-only; running unquantized")
+
+        if compile_model and device == "cuda":
+            # reduce-overhead captures the decode loop into CUDA graphs,
+            # amortizing the per-token kernel-launch latency that dominates
+            # autoregressive TTS steps.
+            model.t3 = torch.compile(model.t3, mode="reduce-overhead", fullgraph=False)
+            model.s3gen = torch.compile(model.s3gen, mode="reduce-overhead")
+        elif maybe_capture_t3_step(model, device):
+            print("✓ T3 decode step captured as a CUDA graph")
+        # One untimed generation so cuDNN algorithm selection and cuBLAS
+        # autotune (plus compilation when enabled) happen before anything is
+        # timed; without this the first printed gen_time is cold-start cost,
+        # not steady-state performance.
+        with inference_context(device):
+            _ = model.generate("Warm up.")
+        _model_cache[key] = model
+    return _model_cache[key]
+
+
+def inference_context(device):
+    """
+    inference_mode plus bf16 autocast (CUDA only) for generation calls.
+    inference_mode skips autograd bookkeeping outright; bf16 halves
+    activation bandwidth and doubles tensor-core throughput in T3.
+    """
+    stack = contextlib.ExitStack()
+    stack.enter_context(torch.inference_mode())
+    stack.enter_context(torch.autocast(device_type=device, dtype=torch.bfloat16,
+                                       enabled=device == "cuda"))
+    return stack
+
+
+def timed_generate(device, fn):
+    """
+    Run fn() under inference_context and return (output, seconds). CUDA
+    kernels are queued asynchronously, so on GPU this times with CUDA event
+    pairs around a synchronize; a bare wall clock would only measure launch
+    latency. CPU falls back to perf_counter.
+    """
+    if device == "cuda":
+        torch.cuda.synchronize()
+        start_evt = torch.cuda.Event(enable_timing=True)
+        end_evt = torch.cuda.Event(enable_timing=True)
+        start_evt.record()
+        with inference_context(device):
+            out = fn()
+        end_evt.record()
+        torch.cuda.synchronize()
+        return out, start_evt.elapsed_time(end_evt) / 1000.0
+    start = time.perf_counter()
+    with inference_context(device):
+        out = fn()
+    return out, time.perf_counter() - start
+
+
+def maybe_capture_t3_step(model, device):
+    """
+    Placeholder for manual CUDA-graph capture of the per-token T3 decode
+    step. Each step is dozens of tiny kernel launches, so replaying a
+    captured graph would remove the ~50us-per-launch CPU overhead that
+    dominates small-model decoding on fast GPUs. Doing that for real needs
+    two things upstream: a static-shape step(last_token, kv_cache) entry
+    point to capture, and a sampling loop that copies into the static
+    buffers and replays the graph instead of calling the module. Neither
+    exists yet, so this always returns False; the same mechanism is
+    available today through --compile, whose reduce-overhead mode captures
+    and replays automatically.
+    """
+    return False
+
+
+def generation_kwargs(model, text):
+    """
+    Cap the autoregressive token budget relative to the text length when the
+    model's generate() accepts one. Roughly 12 speech tokens per word with a
+    600-token ceiling: bounds the worst-case decode if EOS is never sampled,
+    instead of letting a stuck generation run to the model's max_seq_len.
+    """
+    if "max_new_tokens" not in inspect.signature(model.generate).parameters:
+        return {}
+    return {"max_new_tokens": min(600, 12 * len(text.split()))}
+
+
+def load_ort_backend():
+    """
+    Entry point for running the smoke test on ONNX Runtime. Exporting the
+    T3 decoder needs a per-step entry point upstream: torch.onnx.export can
+    capture a single forward, but the sampling loop around it lives in
+    Python, so a faithful export has nothing to trace yet. Until that API
+    exists this verifies the runtime and exits cleanly instead of silently
+    benchmarking the torch backend under an ONNX label.
+    """
+    try:
+        import onnxruntime
+    except ImportError:
+        raise SystemExit(
+            "--backend onnxruntime requires the onnxruntime package "
+            "(pip install onnxruntime)")
+    providers = onnxruntime.get_available_providers()
+    print(f"ONNX Runtime available (providers: {', '.join(providers)})")
+    raise SystemExit(
+        "ChatterboxTTS has no exportable T3 step function yet; the "
+        "onnxruntime backend needs that upstream split before it can run")
+
+
+def test_basic_functionality(compile_model=False, quantize=None):
+    """Basic smoke test of model loading and generation."""
+    device = detect_device()
+    print(f"Using device: {device}")
+
+    model = get_model(device, compile_model, quantize)
+    print("✓ Model loaded")
+    # Background writer: WAV encoding and disk I/O overlap with the next
+    # generation instead of stalling it.
+    io_pool = ThreadPoolExecutor(max_workers=2)
+
+    gen_kwargs = generation_kwargs(model, TEXT)
+    wav, gen_time = timed_generate(device, lambda: model.generate(TEXT, **gen_kwargs))
+    print(f"Speech generated in {gen_time:.2f}s "
+          f"({wav.shape[-1] / model.sr:.2f}s of audio)")
+    io_pool.submit(ta.save, "test_output.wav", to_host(wav, model.sr), model.sr)
+
+    if quantize == "int8" and device == "cpu":
+        # Informational speed/quality check against the FP32 baseline. The
+        # decoder samples stochastically, so waveform correlation is a rough
+        # indicator here, not a hard gate.
+        ref_model = get_model(device, compile_model)
+        ref_wav, ref_time = timed_generate(device, lambda: ref_model.generate(TEXT))
+        n = min(wav.shape[-1], ref_wav.shape[-1])
+        corr = float(np.corrcoef(wav.reshape(-1)[:n].numpy(),
+                                 ref_wav.reshape(-1)[:n].numpy())[0, 1])
+        print(f"INT8 vs FP32: {gen_time:.2f}s vs {ref_time:.2f}s, "
+              f"waveform correlation {corr:.3f}")
+
+    # Sweep the two primary controls. The voice conditionals cached on the
+    # model at load time are reused across the sweep (generate() only
+    # re-derives them when a new reference voice is supplied), so each call
+    # pays for decoding, not re-conditioning.
+    if hasattr(model, "generate_batch"):
+        # One batched forward keeps the GPU occupied instead of paying three
+        # sequential per-call tails.
+        wavs, gen_time = timed_generate(device, lambda: model.generate_batch(
+            [TEXT] * len(PARAMS_TO_TEST),
+            exaggeration=[p["exaggeration"] for p in PARAMS_TO_TEST],
+            cfg_weight=[p["cfg_weight"] for p in PARAMS_TO_TEST],
+        ))
+        print(f"Batch of {len(wavs)} variations generated in {gen_time:.2f}s")
+    else:
+        wavs = []
+        rows = []
+        for i, params in enumerate(PARAMS_TO_TEST):
+            wav, gen_time = timed_generate(
+                device,
+                lambda params=params: model.generate(TEXT, **params, **gen_kwargs))
+            wavs.append(wav)
+            rows.append((i, params["exaggeration"], params["cfg_weight"], gen_time))
+        # Buffered CSV summary: no write() syscalls or string formatting
+        # between the timed iterations above.
+        print("variation,exaggeration,cfg_weight,gen_ms")
+        for i, exaggeration, cfg_weight, gen_time in rows:
+            print(f"{i},{exaggeration},{cfg_weight},{gen_time * 1000:.1f}")
+    # One concatenated file with 0.3s silent separators instead of three
+    # small writes: two fewer open/header/close sequences, and the single
+    # large write pipelines naturally with whatever runs next.
+    separator = torch.zeros(1, int(0.3 * model.sr))
+    pieces = []
+    for wav in wavs:
+        pieces.append(to_host(wav, model.sr).reshape(1, -1))
+        pieces.append(separator)
+    combined = torch.cat(pieces[:-1], dim=-1)
+    if sf is None:
+        io_pool.submit(ta.save, "param_test_all.wav", combined, model.sr)
+    else:
+        # Write PCM16 through a preallocated staging buffer: no float
+        # buffer allocation and no torchaudio backend dispatch.
+        data = combined.numpy().reshape(-1, 1)
+        staging = np.empty(data.shape, dtype=np.int16)
+        np.multiply(data, 32767, out=staging, casting="unsafe")
+        with sf.SoundFile("param_test_all.wav", "w", samplerate=model.sr,
+                          channels=1, subtype="PCM_16") as f:
+            f.write(staging)
+    io_pool.shutdown(wait=True)
+
+    print("✓ All generations completed")
+
+
+# Standalone entry point only; under pytest the fixture-based cases below
+# cover the same sweep without reloading the model per case.
+test_basic_functionality.__test__ = False
+
+
+if pytest is not None:
+
+    @pytest.fixture(scope="session")
+    def tts_model():
+        return get_model()
+
+    @pytest.mark.parametrize("params", PARAMS_TO_TEST)
+    def test_parameter_variation(tts_model, params):
+        wav, _ = timed_generate(
+            detect_device(), lambda: tts_model.generate(TEXT, **params))
+        assert wav.shape[-1] > 0
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Chatterbox TTS smoke test")
+    parser.add_argument("--compile", action="store_true",
+                        help="torch.compile the model before generating (CUDA only)")
+    parser.add_argument("--quantization", choices=["none", "int8"], default="none",
+                        help="Quantize the T3 linear layers (int8 is CPU-only)")
+    parser.add_argument("--backend", choices=["torch", "onnxruntime"], default="torch",
+                        help="Inference backend (onnxruntime pending upstream export support)")
+    args = parser.parse_args()
+    if args.backend == "onnxruntime":
+        load_ort_backend()
+    test_basic_functionality(
+        compile_model=args.compile,
+        quantize=None if args.quantization == "none" else args.quantization)